@@ -3,10 +3,85 @@ import threading
 import json
 import sys
 import os
+import sqlite3
 
 HOST = '127.0.0.1' # Connect to localhost for testing, will use server IP in Docker
 PORT = 65432
 
+CACHE_PATH = os.getenv('CHAT_CACHE_PATH', os.path.expanduser('~/.chat_client_cache.db'))
+HISTORY_DISPLAY_LIMIT = 50
+
+class MessageCache:
+    """Local SQLite store of room messages, so a rejoin only needs the delta from the server.
+
+    sync_state holds, per room, the id up to which the cache has every message since
+    its first fetch. Only contiguous ranges advance it: full history pages, and live
+    messages received after a catch-up finished. Ids are global across rooms, so
+    MAX(id) over cached messages says nothing about gaps.
+    """
+
+    def __init__(self, path, server_key):
+        self.server_key = server_key
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False) # Used from both the input and listener threads
+        with self.lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    server TEXT NOT NULL,
+                    room TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    username TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    timestamp TEXT,
+                    PRIMARY KEY (server, room, id)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    server TEXT NOT NULL,
+                    room TEXT NOT NULL,
+                    synced_id INTEGER NOT NULL,
+                    PRIMARY KEY (server, room)
+                )
+            """)
+            self.conn.commit()
+
+    def add_messages(self, room_name, messages):
+        rows = [(self.server_key, room_name, msg['id'], msg['username'], msg['message'], msg.get('timestamp'))
+                for msg in messages if msg.get('id') is not None]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany("INSERT OR IGNORE INTO messages (server, room, id, username, message, timestamp) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+
+    def synced_id(self, room_name):
+        with self.lock:
+            row = self.conn.execute("SELECT synced_id FROM sync_state WHERE server = ? AND room = ?", (self.server_key, room_name)).fetchone()
+        return row[0] if row else None
+
+    def mark_synced(self, room_name, message_id):
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO sync_state (server, room, synced_id) VALUES (?, ?, ?)
+                ON CONFLICT (server, room) DO UPDATE SET synced_id = MAX(synced_id, excluded.synced_id)
+            """, (self.server_key, room_name, message_id))
+            self.conn.commit()
+
+    def recent_messages(self, room_name, limit=HISTORY_DISPLAY_LIMIT):
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT id, username, message, timestamp FROM messages
+                WHERE server = ? AND room = ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (self.server_key, room_name, limit)).fetchall()
+        return [{"id": row[0], "username": row[1], "message": row[2], "timestamp": row[3]} for row in reversed(rows)]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
 class ChatClient:
     def __init__(self, host, port):
         self.host = host
@@ -16,12 +91,20 @@ class ChatClient:
         self.current_room = None
         self.stop_listening = threading.Event()
         self.listener_thread = None
+        self.room_list_query = {}
+        self.cache = None
+        self.room_synced = False # Cache holds everything up to now for current_room, so live messages extend it
+        self.new_message_count = 0
 
     def connect(self):
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.connect((self.host, self.port))
             print(f"Connected to server at {self.host}:{self.port}")
+            try:
+                self.cache = MessageCache(CACHE_PATH, f"{self.host}:{self.port}")
+            except sqlite3.Error as e:
+                print(f"Local message cache unavailable, history will be fetched in full: {e}")
             self.listener_thread = threading.Thread(target=self.listen_for_messages)
             self.listener_thread.daemon = True
             self.listener_thread.start()
@@ -102,6 +185,7 @@ class ChatClient:
             if response["success"]:
                 print(f"Successfully left room: {response['message']}")
                 self.current_room = None
+                self.room_synced = False
                 self.display_main_menu()
             else:
                 print(f"Failed to leave room: {response['message']}")
@@ -110,6 +194,10 @@ class ChatClient:
             sender = response.get("sender", "Unknown")
             room = response.get("room", "Unknown")
             message = response.get("message", "")
+            if self.cache and response.get("id") is not None:
+                self.cache.add_messages(room, [{"id": response["id"], "username": sender, "message": message, "timestamp": response.get("timestamp")}])
+                if self.room_synced and room == self.current_room:
+                    self.cache.mark_synced(room, response["id"])
             print(f"\n[{room}] {sender}: {message}")
             if self.current_room:
                 sys.stdout.write(f"[{self.current_room}]> ") # Re-prompt after message
@@ -118,26 +206,37 @@ class ChatClient:
         elif response_type == "chat_history":
             room_name = response.get("room")
             history = response.get("history", [])
-            print(f"\n--- Chat History for {room_name} ---")
-            if not history:
-                print("No history available yet.")
-            for msg in history:
-                print(f"[{msg['timestamp']}] {msg['username']}: {msg['message']}")
-            print("------------------------------")
-            if self.current_room:
-                sys.stdout.write(f"[{self.current_room}]> ")
-            sys.stdout.flush()
+            if self.cache:
+                self.cache.add_messages(room_name, history)
+                if history:
+                    self.cache.mark_synced(room_name, history[-1]['id'])
+                if response.get("since_id") is not None:
+                    self.new_message_count += len(history)
+                    if response.get("has_more") and history and room_name == self.current_room:
+                        self.send_request("chat_history", {"room_name": room_name, "since_id": history[-1]['id']})
+                        return
+                    print(f"\n{self.new_message_count} new message(s) since your last visit.")
+                if room_name == self.current_room:
+                    self.room_synced = True
+                history = self.cache.recent_messages(room_name)
+            self.print_history(room_name, history)
 
         elif response_type == "room_list":
             rooms = response.get("rooms", [])
+            next_cursor = response.get("next_cursor")
             print("\n--- Available Rooms ---")
-            if not rooms:
+            if not rooms and next_cursor is None:
                 print("No rooms available. Create one!")
             else:
                 for room in rooms:
                     status = "(Private)" if room['is_private'] else "(Public)"
-                    print(f"- {room['name']} {status}")
+                    print(f"- {room['name']} {status} [{room.get('active_users', 0)} online]")
             print("-----------------------")
+            if next_cursor is not None:
+                more = input("More rooms available. Show next page? (yes/no): ").lower()
+                if more == 'yes':
+                    self.send_request("list_rooms", {**self.room_list_query, "cursor": next_cursor})
+                    return
             if self.username:
                 self.display_main_menu()
             else:
@@ -188,6 +287,17 @@ class ChatClient:
         else:
             print(f"Unknown response type: {response_type}")
 
+    def print_history(self, room_name, history):
+        print(f"\n--- Chat History for {room_name} ---")
+        if not history:
+            print("No history available yet.")
+        for msg in history:
+            print(f"[{msg['timestamp']}] {msg['username']}: {msg['message']}")
+        print("------------------------------")
+        if self.current_room:
+            sys.stdout.write(f"[{self.current_room}]> ")
+        sys.stdout.flush()
+
     def display_auth_menu(self):
         print("\n--- Authentication ---")
         print("1. Login")
@@ -218,10 +328,20 @@ class ChatClient:
         print("6. Exit")
         choice = input("Enter choice: ")
         if choice == '1':
-            self.send_request("list_rooms")
+            prefix = input("Filter by name prefix (leave blank for all): ")
+            sort_str = input("Sort by (name/members) [name]: ").lower()
+            sort = 'members' if sort_str == 'members' else 'name'
+            self.room_list_query = {"prefix": prefix, "sort": sort}
+            self.send_request("list_rooms", self.room_list_query)
         elif choice == '2':
             room_name = input("Enter room name to join: ")
-            self.send_request("join_room", {"room_name": room_name})
+            join_data = {"room_name": room_name}
+            last_seen_id = self.cache.synced_id(room_name) if self.cache else None
+            if last_seen_id is not None:
+                join_data["last_seen_id"] = last_seen_id
+            self.room_synced = False
+            self.new_message_count = 0
+            self.send_request("join_room", join_data)
         elif choice == '3':
             room_name = input("Enter new room name: ")
             is_private_str = input("Make room private? (yes/no): ").lower()
@@ -233,6 +353,7 @@ class ChatClient:
             print("Logging out...")
             self.username = None
             self.current_room = None
+            self.room_synced = False
             self.display_auth_menu()
         elif choice == '6':
             self.shutdown()
@@ -250,7 +371,10 @@ class ChatClient:
                     elif message.lower() == "users":
                         self.send_request("room_info")
                     elif message.lower() == "history":
-                        self.send_request("chat_history", {"room_name": self.current_room})
+                        if self.cache:
+                            self.print_history(self.current_room, self.cache.recent_messages(self.current_room))
+                        else:
+                            self.send_request("chat_history", {"room_name": self.current_room})
                     elif message.lower() == "stats":
                         self.send_request("room_info")
                     elif message.lower() == "leaderboard":
@@ -280,6 +404,8 @@ class ChatClient:
             self.socket.close()
         if self.listener_thread and self.listener_thread.is_alive():
             self.listener_thread.join(timeout=1)
+        if self.cache:
+            self.cache.close()
         sys.exit(0)
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+import argparse
+import json
+import socket
+import threading
+import time
+
+import server
+
+SCRATCH_DB_HELP = """
+The replay runs the real request handlers, so it WRITES to the database given by
+--database-url: replayed register, create_room and message requests insert users,
+rooms and messages. Never point it at production. Use a scratch database and
+recreate it before each run, so every replay takes the same code paths:
+
+  dropdb --if-exists chat_replay && createdb chat_replay
+  psql chat_replay -f db_schema.sql
+  python server/replay.py capture.jsonl --database-url "dbname=chat_replay" \\
+      --password-file passwords.json --seed
+
+passwords.json maps each captured username to the password to log in with, e.g.
+{"alice": "pw1", "bob": "pw2"}. Captured passwords are always redacted.
+"""
+
+def load_capture(path):
+    events = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Skipping malformed capture line {line_number}")
+    events.sort(key=lambda event: event['t'])
+    return events
+
+def captured_frames(events):
+    for event in events:
+        if event['e'] != 'frame':
+            continue
+        try:
+            frames = server.split_frames(event['d'])
+        except json.JSONDecodeError:
+            continue
+        for frame in frames:
+            if isinstance(frame, dict):
+                yield frame
+
+def load_passwords(path):
+    with open(path, encoding='utf-8') as f:
+        passwords = json.load(f)
+    if not isinstance(passwords, dict):
+        raise SystemExit(f"{path} must hold a JSON object mapping usernames to passwords")
+    return passwords
+
+def restore_credentials(data, passwords, default_password=None):
+    # Captures never contain real passwords; swap in the ones supplied for this replay.
+    if '"<redacted>"' not in data:
+        return data
+    try:
+        frames = server.split_frames(data)
+    except json.JSONDecodeError:
+        return data
+    for frame in frames:
+        if isinstance(frame, dict) and frame.get("password") == "<redacted>":
+            password = passwords.get(frame.get("username"), default_password)
+            if password is not None:
+                frame["password"] = password
+    return "".join(json.dumps(frame) for frame in frames)
+
+def seed_database(events, passwords):
+    """Registers the users in `passwords` and creates the rooms the capture joins but never creates.
+
+    Users and rooms that the capture itself registers or creates are left alone, so
+    those requests take the same path they took when they were recorded.
+    """
+    registered, created, joined = set(), set(), set()
+    for frame in captured_frames(events):
+        if frame.get("type") == "register":
+            registered.add(frame.get("username"))
+        elif frame.get("type") == "create_room":
+            created.add(frame.get("room_name"))
+        elif frame.get("type") == "join_room":
+            joined.add(frame.get("room_name"))
+    for username, password in passwords.items():
+        if username not in registered:
+            server.register_user(username, password)
+    for room_name in sorted(name for name in joined - created if isinstance(name, str)):
+        server.create_room_db(room_name, False, None)
+
+def drain(sock, conn_id, auth_failures):
+    # Read and discard responses so the server never blocks on a full send buffer,
+    # noting failed logins: every later request on that connection hits the auth error path.
+    marker = '"type": "auth_response", "success": false'
+    tail = ""
+    try:
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            text = tail + data.decode('utf-8', errors='replace')
+            if marker in text:
+                auth_failures.append(conn_id)
+                print(f"Warning: auth failed on replayed connection {conn_id}; check its password")
+                text = ""
+            tail = text[-len(marker):]
+    except OSError:
+        pass
+
+def start_local_server():
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind(('127.0.0.1', 0))
+    server_socket.listen(64)
+    server.load_rooms()
+    accept_thread = threading.Thread(target=server.accept_connections, args=(server_socket,))
+    accept_thread.daemon = True
+    accept_thread.start()
+    return server_socket.getsockname()
+
+def replay(events, address, speed=1.0, passwords=None, default_password=None, auth_failures=None):
+    """Drives the server at `address` with the captured events.
+
+    `speed` scales the original inter-frame gaps (2.0 replays twice as fast); 0 sends
+    frames back to back, which can make the server read several frames in one recv.
+    """
+    passwords = passwords or {}
+    auth_failures = [] if auth_failures is None else auth_failures
+    connections = {}
+    frames_sent = 0
+    if not events:
+        return frames_sent
+    capture_start = events[0]['t']
+    replay_start = time.perf_counter()
+
+    for event in events:
+        if speed > 0:
+            delay = (event['t'] - capture_start) / speed - (time.perf_counter() - replay_start)
+            if delay > 0:
+                time.sleep(delay)
+
+        conn_id = event['c']
+        if event['e'] == 'open':
+            sock = socket.create_connection(address)
+            drain_thread = threading.Thread(target=drain, args=(sock, conn_id, auth_failures))
+            drain_thread.daemon = True
+            drain_thread.start()
+            connections[conn_id] = sock
+        elif event['e'] == 'frame':
+            sock = connections.get(conn_id)
+            if sock is None:
+                continue # Connection opened before the capture started
+            try:
+                sock.sendall(restore_credentials(event['d'], passwords, default_password).encode('utf-8'))
+                frames_sent += 1
+            except OSError as e:
+                print(f"Connection {conn_id} dropped during replay: {e}")
+                connections.pop(conn_id).close()
+        elif event['e'] == 'close':
+            sock = connections.pop(conn_id, None)
+            if sock:
+                sock.close()
+
+    for sock in connections.values():
+        sock.close()
+    return frames_sent
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a CHAT_CAPTURE_PATH capture against a local server and profile it.",
+        epilog=SCRATCH_DB_HELP,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("capture", help="capture file recorded by the server")
+    parser.add_argument("--database-url", required=True, help="scratch database to run against; it is modified by the replay")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier, 0 for no delays (default: 1.0)")
+    parser.add_argument("--password-file", help="JSON object of username to password, sent in place of redacted passwords")
+    parser.add_argument("--password", help="password for users not in --password-file")
+    parser.add_argument("--seed", action="store_true", help="register --password-file users and create joined rooms the capture does not create")
+    parser.add_argument("--types", help="comma-separated request types to profile (default: all)")
+    parser.add_argument("--no-cprofile", action="store_true", help="only collect timings, skip cProfile")
+    parser.add_argument("--tracemalloc", action="store_true", help="sample allocations with tracemalloc")
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="fraction of requests to sample (default: 1.0)")
+    parser.add_argument("--top", type=int, default=15, help="functions to show per request type (default: 15)")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to wait for in-flight requests after the last frame")
+    parser.add_argument("--report", help="write the profile report to this file instead of stdout")
+    args = parser.parse_args()
+
+    server.DATABASE_URL = args.database_url
+    events = load_capture(args.capture)
+    passwords = load_passwords(args.password_file) if args.password_file else {}
+    if args.password is None:
+        missing = sorted({frame.get("username") for frame in captured_frames(events)
+                          if frame.get("type") == "auth" and frame.get("username") not in passwords}, key=str)
+        if missing:
+            print(f"Warning: no password for {', '.join(map(str, missing))}; their logins will fail")
+    if args.seed:
+        seed_database(events, passwords)
+
+    request_types = [t.strip() for t in args.types.split(",") if t.strip()] if args.types else None
+    server.profiler = server.RequestProfiler(
+        request_types=request_types,
+        use_cprofile=not args.no_cprofile,
+        use_tracemalloc=args.tracemalloc,
+        sample_rate=args.sample_rate,
+    )
+
+    address = start_local_server()
+    print(f"Replaying {len(events)} events from {args.capture} against {address[0]}:{address[1]}")
+    started = time.perf_counter()
+    auth_failures = []
+    frames_sent = replay(events, address, speed=args.speed, passwords=passwords,
+                         default_password=args.password, auth_failures=auth_failures)
+    time.sleep(args.settle)
+    print(f"Sent {frames_sent} frames in {time.perf_counter() - started:.2f}s")
+    if auth_failures:
+        print(f"Warning: {len(auth_failures)} replayed login(s) failed; the report includes their "
+              f"connections' 'Authentication required.' responses instead of the captured workload")
+
+    report = server.profiler.report(top=args.top)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write(report)
+        print(f"Profile report written to {args.report}")
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 import socket
 import threading
+import bisect
 import hashlib
 import json
 import time
 import datetime
+import itertools
+import random
+import io
+import cProfile
+import pstats
+import tracemalloc
 import psycopg2
 from psycopg2 import sql
 import os
@@ -14,9 +21,28 @@ PORT = 65432
 DATABASE_URL = os.getenv('DATABASE_URL', 'dbname=chat_db user=chat_user password=chat_pass host=localhost port=5432')
 
 clients = {} # {username: socket_object}
-rooms = {}   # {room_name: {users: {username: socket_object}, history: [], stats: {total_messages: 0, active_users: 0}}}
+rooms = {}   # {room_name: {users: {username: socket_object}, is_private: bool, history: [], stats: {total_messages: 0, active_users: 0}}}
+room_index = [] # Sorted room names, kept in step with `rooms` so list_rooms never has to hit the DB
+member_index = [] # Sorted (-active_users, room_name), updated wherever a room's member count changes
 lock = threading.Lock()
 
+DEFAULT_ROOM_PAGE_SIZE = 20
+MAX_ROOM_PAGE_SIZE = 50
+HISTORY_PAGE_SIZE = 50
+MAX_ROOM_NAME_LENGTH = 100 # rooms.name is VARCHAR(100)
+MAX_ROOM_SCAN = 10000 # Index entries a filtered members-sorted page may rank or skip over while holding `lock`
+MAX_FRAME_BYTES = 4096 # The client reads each frame with a single recv(4096)
+# Worst-case encoded cursor: a name of 100 astral characters escapes to 12 bytes each.
+MAX_CURSOR_BYTES = len(json.dumps([2 ** 31, "\U0001F600" * MAX_ROOM_NAME_LENGTH]))
+
+# Set CHAT_CAPTURE_PATH to record every inbound frame for later replay (see replay.py).
+CAPTURE_PATH = os.getenv('CHAT_CAPTURE_PATH')
+capture_file = None
+capture_lock = threading.Lock()
+connection_ids = itertools.count(1)
+
+profiler = None # RequestProfiler, installed by replay.py for local profiling sessions
+
 def get_db_connection():
     try:
         conn = psycopg2.connect(DATABASE_URL)
@@ -81,24 +107,29 @@ def get_user_id(username):
         return None
 
 def store_message(room_name, username, message_content):
+    """Stores a message and returns (id, timestamp), or (None, None) if it could not be stored."""
     conn = get_db_connection()
     if not conn:
-        return
+        return None, None
     try:
         cursor = conn.cursor()
         user_id = get_user_id(username)
         cursor.execute("SELECT id FROM rooms WHERE name = %s", (room_name,))
         room_id = cursor.fetchone()[0]
+        message_id, timestamp = None, None
         if user_id and room_id:
-            cursor.execute("INSERT INTO messages (room_id, user_id, content) VALUES (%s, %s, %s)", (room_id, user_id, message_content))
+            cursor.execute("INSERT INTO messages (room_id, user_id, content) VALUES (%s, %s, %s) RETURNING id, timestamp", (room_id, user_id, message_content))
+            message_id, timestamp = cursor.fetchone()
             conn.commit()
         conn.close()
+        return message_id, timestamp
     except Exception as e:
         print(f"Error storing message: {e}")
         if conn:
             conn.rollback()
         if conn:
             conn.close()
+        return None, None
 
 def update_user_activity(user_id, room_id, message_count_increment=0, active_time_increment=0):
     conn = get_db_connection()
@@ -123,32 +154,96 @@ def update_user_activity(user_id, room_id, message_count_increment=0, active_tim
         if conn:
             conn.close()
 
-def get_room_history(room_name):
+def get_room_history(room_name, since_id=None):
+    """Returns (messages, has_more) for a room, oldest first.
+
+    Without `since_id` this is the latest HISTORY_PAGE_SIZE messages. With it, it is
+    the next page after that id; has_more tells the client to ask again from the
+    last id returned.
+    """
     conn = get_db_connection()
     if not conn:
-        return []
+        return [], False
     try:
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM rooms WHERE name = %s", (room_name,))
         room_id = cursor.fetchone()
         if not room_id:
             conn.close()
-            return []
+            return [], False
         room_id = room_id[0]
-        cursor.execute("""
-            SELECT u.username, m.content, m.timestamp
-            FROM messages m
-            JOIN users u ON m.user_id = u.id
-            WHERE m.room_id = %s
-            ORDER BY m.timestamp ASC
-            LIMIT 50
-        """, (room_id,))
-        history = [{"username": row[0], "message": row[1], "timestamp": str(row[2])} for row in cursor.fetchall()]
+        if since_id is not None:
+            cursor.execute("""
+                SELECT m.id, u.username, m.content, m.timestamp
+                FROM messages m
+                JOIN users u ON m.user_id = u.id
+                WHERE m.room_id = %s AND m.id > %s
+                ORDER BY m.id ASC
+                LIMIT %s
+            """, (room_id, since_id, HISTORY_PAGE_SIZE + 1))
+            rows = cursor.fetchall()
+        else:
+            cursor.execute("""
+                SELECT m.id, u.username, m.content, m.timestamp
+                FROM messages m
+                JOIN users u ON m.user_id = u.id
+                WHERE m.room_id = %s
+                ORDER BY m.id DESC
+                LIMIT %s
+            """, (room_id, HISTORY_PAGE_SIZE))
+            rows = cursor.fetchall()[::-1]
+        has_more = len(rows) > HISTORY_PAGE_SIZE
+        history = [{"id": row[0], "username": row[1], "message": row[2], "timestamp": str(row[3])} for row in rows[:HISTORY_PAGE_SIZE]]
         conn.close()
-        return history
+        return history, has_more
     except Exception as e:
         print(f"Error getting room history: {e}")
-        return []
+        return [], False
+
+def fit_history_entry(entry, budget):
+    """Shortens a message too large for a frame on its own, so a sync can still move past it."""
+    if len(json.dumps(entry)) <= budget:
+        return entry
+    message = entry["message"]
+    entry["truncated"] = True
+    lo, hi = 0, len(message) # Longest prefix that fits; escaping makes bytes per character vary
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        entry["message"] = message[:mid]
+        if len(json.dumps(entry)) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    entry["message"] = message[:lo]
+    return entry
+
+def history_response(room_name, since_id):
+    """Builds a chat_history frame that fits in MAX_FRAME_BYTES once encoded.
+
+    A catch-up page keeps its oldest messages and sets has_more when any are left
+    over; a full fetch keeps the newest, since older messages are never offered.
+    """
+    if not isinstance(since_id, int) or isinstance(since_id, bool):
+        since_id = None
+    history, has_more = get_room_history(room_name, since_id=since_id)
+    response = {"type": "chat_history", "room": room_name, "history": [], "since_id": since_id, "has_more": False}
+    budget = MAX_FRAME_BYTES - len(json.dumps(response))
+    candidates = history if since_id is not None else history[::-1]
+    page = []
+    for entry in candidates:
+        entry_bytes = len(json.dumps(entry)) + (2 if page else 0)
+        if entry_bytes > budget:
+            if not page:
+                page.append(fit_history_entry(entry, budget))
+            break
+        budget -= entry_bytes
+        page.append(entry)
+    if since_id is not None:
+        response["history"] = page
+        response["has_more"] = has_more or len(page) < len(history)
+    else:
+        response["history"] = page[::-1]
+    return response
 
 def get_leaderboard():
     conn = get_db_connection()
@@ -171,13 +266,17 @@ def get_leaderboard():
         print(f"Error getting leaderboard: {e}")
         return []
 
-def broadcast_message(room_name, sender_username, message):
+def broadcast_message(room_name, sender_username, message, message_id=None, timestamp=None):
     with lock:
         if room_name in rooms:
             full_message = f"[{room_name}] {sender_username}: {message}"
+            payload = {"type": "chat", "sender": sender_username, "room": room_name, "message": message}
+            if message_id is not None:
+                payload["id"] = message_id
+                payload["timestamp"] = str(timestamp)
             for client_socket in rooms[room_name]['users'].values():
                 try:
-                    client_socket.sendall(json.dumps({"type": "chat", "sender": sender_username, "room": room_name, "message": message}).encode('utf-8'))
+                    client_socket.sendall(json.dumps(payload).encode('utf-8'))
                 except:
                     pass # Client disconnected, will be handled by client_handler
 
@@ -221,20 +320,259 @@ def get_all_rooms_db():
         print(f"Error getting all rooms from DB: {e}")
         return []
 
+def add_room_to_index(room_name, is_private):
+    # Caller must hold `lock`.
+    rooms[room_name] = {'users': {}, 'is_private': is_private, 'history': [], 'stats': {'total_messages': 0, 'active_users': 0}}
+    bisect.insort(room_index, room_name)
+    bisect.insort(member_index, (0, room_name))
+
+def update_active_users(room_name):
+    # Caller must hold `lock`.
+    stats = rooms[room_name]['stats']
+    old_key = (-stats['active_users'], room_name)
+    stats['active_users'] = len(rooms[room_name]['users'])
+    new_key = (-stats['active_users'], room_name)
+    if new_key != old_key:
+        del member_index[bisect.bisect_left(member_index, old_key)]
+        bisect.insort(member_index, new_key)
+
+def room_summary(room_name):
+    room = rooms[room_name]
+    return {"name": room_name, "is_private": room['is_private'], "active_users": room['stats']['active_users']}
+
+def room_list_response(prefix="", sort="name", cursor=None, limit=DEFAULT_ROOM_PAGE_SIZE):
+    """Builds a room_list frame from the in-memory indexes. Caller must hold `lock`.
+
+    The cursor is the sort key of the last room returned: its name for sort="name",
+    [active_users, name] for sort="members". Member counts move while a client pages,
+    so a room whose count changes between pages may be skipped or shown twice.
+    Pages stop early rather than exceed MAX_FRAME_BYTES once encoded.
+    """
+    try:
+        limit = max(1, min(int(limit), MAX_ROOM_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = DEFAULT_ROOM_PAGE_SIZE
+    prefix = prefix[:MAX_ROOM_NAME_LENGTH] if isinstance(prefix, str) else ""
+
+    # Names sharing a prefix are contiguous in the sorted name index.
+    lo = bisect.bisect_left(room_index, prefix)
+    hi = bisect.bisect_left(room_index, prefix + "\U0010ffff") if prefix else len(room_index)
+
+    if sort == "members":
+        if prefix and hi - lo <= MAX_ROOM_SCAN:
+            # Few matches: rank just those instead of skipping through member_index.
+            index = sorted((-rooms[name]['stats']['active_users'], name) for name in room_index[lo:hi])
+        else:
+            index = member_index
+        if (isinstance(cursor, list) and len(cursor) == 2 and isinstance(cursor[0], int)
+                and isinstance(cursor[1], str)):
+            start = bisect.bisect_right(index, (-cursor[0], cursor[1]))
+        else:
+            start = 0
+        end = len(index)
+        scan_end = min(end, start + MAX_ROOM_SCAN) if index is member_index and prefix else end
+        name_of = lambda entry: entry[1]
+        key_of = lambda entry: [-entry[0], entry[1]]
+    else:
+        sort = "name"
+        start = max(lo, bisect.bisect_right(room_index, cursor)) if isinstance(cursor, str) else lo
+        end = hi
+        index, scan_end = room_index, end
+        name_of = key_of = lambda entry: entry
+
+    response = {"type": "room_list", "rooms": [], "prefix": prefix, "sort": sort, "next_cursor": None}
+    frame_bytes = len(json.dumps(response)) - len("null") + MAX_CURSOR_BYTES
+    pos = start
+    while pos < scan_end and len(response["rooms"]) < limit:
+        name = name_of(index[pos])
+        if name.startswith(prefix):
+            summary = room_summary(name)
+            summary_bytes = len(json.dumps(summary)) + (2 if response["rooms"] else 0)
+            if frame_bytes + summary_bytes > MAX_FRAME_BYTES:
+                break
+            frame_bytes += summary_bytes
+            response["rooms"].append(summary)
+        pos += 1
+
+    if start < pos < end:
+        response["next_cursor"] = key_of(index[pos - 1])
+    return response
+
+def open_capture(path):
+    global capture_file
+    capture_file = open(path, 'a', encoding='utf-8')
+    print(f"Capturing inbound traffic to {path}")
+
+def split_frames(data):
+    """Splits one recv into its JSON frames; raises JSONDecodeError if it is malformed."""
+    decoder = json.JSONDecoder()
+    frames = []
+    pos = 0
+    while True:
+        while pos < len(data) and data[pos].isspace():
+            pos += 1
+        if pos == len(data):
+            return frames
+        frame, pos = decoder.raw_decode(data, pos)
+        frames.append(frame)
+
+def redact_passwords(value):
+    if isinstance(value, dict):
+        return {key: "<redacted>" if key == "password" else redact_passwords(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact_passwords(item) for item in value]
+    return value
+
+def redact_frames(data):
+    """Returns a captured recv with every "password" value replaced, whatever its JSON type.
+
+    Never write credentials to disk; replay.py substitutes its own. Frames coalesced
+    into the same recv stay replayable. A chunk that cannot be parsed is kept only if
+    it cannot hide a password key, escaped or cut off mid-value.
+    """
+    try:
+        frames = split_frames(data)
+    except json.JSONDecodeError:
+        return "<redacted>" if "password" in data or "\\u" in data else data
+    redacted = [redact_passwords(frame) for frame in frames]
+    if redacted == frames:
+        return data
+    return "".join(json.dumps(frame) for frame in redacted)
+
+def record_frame(conn_id, event, data=None):
+    """Appends one capture line: {"t": unix time, "c": connection id, "e": open|frame|close, "d": raw frame}."""
+    if capture_file is None:
+        return
+    entry = {"t": round(time.time(), 6), "c": conn_id, "e": event}
+    if data is not None:
+        entry["d"] = redact_frames(data)
+    line = json.dumps(entry, separators=(',', ':'))
+    with capture_lock:
+        capture_file.write(line + "\n")
+        capture_file.flush()
+
+class RequestProfiler:
+    """Collects per-request-type timings, with optional cProfile and tracemalloc sampling.
+
+    Each request type has its own sampling slot, so a busy type cannot starve the
+    others of samples; a request arriving while another of its type is being sampled
+    is only timed. cProfile follows the handler thread alone, but tracemalloc is
+    process-wide: its figures include whatever other handler threads allocate while
+    a sample is open.
+    """
+
+    def __init__(self, request_types=None, use_cprofile=True, use_tracemalloc=False, sample_rate=1.0):
+        self.request_types = set(request_types) if request_types else None
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.sample_rate = sample_rate
+        self.stats_lock = threading.Lock()
+        self.sampling = set() # Request types with a sample currently open
+        self.timings = {} # {request_type: {count, total, max}}
+        self.samples = {} # {request_type: {count, stats, alloc_bytes}}
+        if use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def start(self, request_type):
+        if self.request_types is not None and request_type not in self.request_types:
+            return None
+        sample = {'type': request_type, 'sampled': False, 'cprofile': None}
+        if random.random() < self.sample_rate:
+            with self.stats_lock:
+                if request_type not in self.sampling:
+                    self.sampling.add(request_type)
+                    sample['sampled'] = True
+        if sample['sampled']:
+            if self.use_tracemalloc:
+                sample['mem_before'] = tracemalloc.get_traced_memory()[0]
+            if self.use_cprofile:
+                cprofile = cProfile.Profile()
+                try:
+                    cprofile.enable()
+                    sample['cprofile'] = cprofile
+                except ValueError:
+                    pass # Python 3.12+ allows only one active profiler per process
+        sample['start'] = time.perf_counter()
+        return sample
+
+    def finish(self, sample):
+        elapsed = time.perf_counter() - sample['start']
+        request_type = sample['type']
+        cprofile = sample['cprofile']
+        if cprofile:
+            cprofile.disable()
+        if sample['sampled'] and self.use_tracemalloc:
+            alloc_bytes = tracemalloc.get_traced_memory()[0] - sample['mem_before']
+        with self.stats_lock:
+            timing = self.timings.setdefault(request_type, {'count': 0, 'total': 0.0, 'max': 0.0})
+            timing['count'] += 1
+            timing['total'] += elapsed
+            timing['max'] = max(timing['max'], elapsed)
+            if sample['sampled']:
+                self.sampling.discard(request_type)
+                stats = self.samples.setdefault(request_type, {'count': 0, 'stats': None, 'alloc_bytes': 0})
+                stats['count'] += 1
+                if cprofile:
+                    if stats['stats'] is None:
+                        stats['stats'] = pstats.Stats(cprofile)
+                    else:
+                        stats['stats'].add(cprofile)
+                if self.use_tracemalloc:
+                    stats['alloc_bytes'] += alloc_bytes
+
+    def report(self, top=15):
+        out = io.StringIO()
+        with self.stats_lock:
+            for request_type in sorted(self.timings, key=lambda t: -self.timings[t]['total']):
+                timing = self.timings[request_type]
+                sample = self.samples.get(request_type)
+                print(f"=== {request_type} ===", file=out)
+                print(f"requests: {timing['count']}  total: {timing['total'] * 1000:.1f} ms  "
+                      f"avg: {timing['total'] / timing['count'] * 1000:.2f} ms  max: {timing['max'] * 1000:.2f} ms", file=out)
+                if not sample:
+                    print("sampled: 0\n", file=out)
+                    continue
+                print(f"sampled: {sample['count']}", file=out)
+                if self.use_tracemalloc:
+                    print(f"net allocated, process-wide: {sample['alloc_bytes'] / sample['count']:.0f} B/request "
+                          f"(includes concurrent requests)", file=out)
+                if sample['stats'] is not None:
+                    sample['stats'].stream = out
+                    sample['stats'].sort_stats('cumulative').print_stats(top)
+                print(file=out)
+        return out.getvalue()
+
+def start_request_profile(request_type):
+    if profiler is None:
+        return None
+    if not isinstance(request_type, str):
+        # "type" comes straight from client JSON and may be unhashable.
+        request_type = str(request_type)
+    return profiler.start(request_type)
+
+def finish_request_profile(sample):
+    if sample is not None:
+        profiler.finish(sample)
+
 def client_handler(client_socket, addr):
     username = None
     current_room = None
     user_id = None
     last_activity_time = time.time()
+    conn_id = next(connection_ids)
+    record_frame(conn_id, "open")
 
     while True:
+        sample = None
         try:
             message_data = client_socket.recv(4096).decode('utf-8')
             if not message_data:
                 break
+            record_frame(conn_id, "frame", message_data)
 
             request = json.loads(message_data)
             request_type = request.get("type")
+            sample = start_request_profile(request_type)
 
             if request_type == "auth":
                 username = request.get("username")
@@ -277,7 +615,7 @@ def client_handler(client_socket, addr):
                         send_to_client(client_socket, {"type": "room_creation_response", "success": False, "message": f"Room '{room_name}' already exists."})
                     else:
                         if create_room_db(room_name, is_private, owner_id):
-                            rooms[room_name] = {'users': {}, 'history': [], 'stats': {'total_messages': 0, 'active_users': 0}}
+                            add_room_to_index(room_name, is_private)
                             send_to_client(client_socket, {"type": "room_creation_response", "success": True, "message": f"Room '{room_name}' created successfully."})
                             print(f"User {username} created room '{room_name}' (Private: {is_private})")
                         else:
@@ -289,16 +627,15 @@ def client_handler(client_socket, addr):
                     if room_name in rooms:
                         if current_room:
                             rooms[current_room]['users'].pop(username, None)
-                            rooms[current_room]['stats']['active_users'] = len(rooms[current_room]['users'])
+                            update_active_users(current_room)
                             broadcast_message(current_room, "SERVER", f"{username} has left the room.")
 
                         rooms[room_name]['users'][username] = client_socket
-                        rooms[room_name]['stats']['active_users'] = len(rooms[room_name]['users'])
+                        update_active_users(room_name)
                         current_room = room_name
                         send_to_client(client_socket, {"type": "room_join_response", "success": True, "room": room_name, "message": f"Joined room '{room_name}'."})
                         broadcast_message(current_room, "SERVER", f"{username} has joined the room.")
-                        history = get_room_history(room_name)
-                        send_to_client(client_socket, {"type": "chat_history", "room": room_name, "history": history})
+                        send_to_client(client_socket, history_response(room_name, request.get("last_seen_id")))
                         print(f"User {username} joined room '{room_name}'")
                     else:
                         send_to_client(client_socket, {"type": "room_join_response", "success": False, "message": f"Room '{room_name}' does not exist."})
@@ -308,7 +645,7 @@ def client_handler(client_socket, addr):
                     with lock:
                         if username in rooms[current_room]['users']:
                             rooms[current_room]['users'].pop(username)
-                            rooms[current_room]['stats']['active_users'] = len(rooms[current_room]['users'])
+                            update_active_users(current_room)
                             broadcast_message(current_room, "SERVER", f"{username} has left the room.")
                             send_to_client(client_socket, {"type": "room_leave_response", "success": True, "room": current_room, "message": f"Left room '{current_room}'."})
                             print(f"User {username} left room '{current_room}'")
@@ -318,11 +655,18 @@ def client_handler(client_socket, addr):
                 else:
                     send_to_client(client_socket, {"type": "room_leave_response", "success": False, "message": "You are not currently in any room."})
 
+            elif request_type == "chat_history":
+                room_name = request.get("room_name")
+                if current_room and room_name == current_room:
+                    send_to_client(client_socket, history_response(room_name, request.get("since_id")))
+                else:
+                    send_to_client(client_socket, {"type": "error", "message": "You must join a room to view its history."})
+
             elif request_type == "message":
                 message = request.get("message")
                 if current_room and username:
-                    broadcast_message(current_room, username, message)
-                    store_message(current_room, username, message)
+                    message_id, timestamp = store_message(current_room, username, message)
+                    broadcast_message(current_room, username, message, message_id, timestamp)
                     rooms[current_room]['stats']['total_messages'] += 1
                     update_user_activity(user_id, get_room_id(current_room), message_count_increment=1)
                     last_activity_time = time.time() # Reset activity time on message
@@ -330,8 +674,9 @@ def client_handler(client_socket, addr):
                     send_to_client(client_socket, {"type": "error", "message": "You must join a room to send messages."})
 
             elif request_type == "list_rooms":
-                room_list = get_all_rooms_db()
-                send_to_client(client_socket, {"type": "room_list", "rooms": room_list})
+                with lock:
+                    response = room_list_response(request.get("prefix", ""), request.get("sort", "name"), request.get("cursor"), request.get("limit", DEFAULT_ROOM_PAGE_SIZE))
+                send_to_client(client_socket, response)
 
             elif request_type == "room_info":
                 if current_room:
@@ -371,6 +716,10 @@ def client_handler(client_socket, addr):
         except Exception as e:
             print(f"Error handling client {username if username else addr}: {e}")
             break
+        finally:
+            finish_request_profile(sample)
+
+    record_frame(conn_id, "close")
 
     # Cleanup on client disconnect
     with lock:
@@ -378,7 +727,7 @@ def client_handler(client_socket, addr):
             del clients[username]
         if current_room and username in rooms[current_room]['users']:
             del rooms[current_room]['users'][username]
-            rooms[current_room]['stats']['active_users'] = len(rooms[current_room]['users'])
+            update_active_users(current_room)
             broadcast_message(current_room, "SERVER", f"{username} has disconnected.")
             print(f"User {username} disconnected from room '{current_room}'")
         print(f"Connection with {addr} closed.")
@@ -398,25 +747,36 @@ def get_room_id(room_name):
         print(f"Error getting room ID: {e}")
         return None
 
-def start_server():
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_socket.bind((HOST, PORT))
-    server_socket.listen(5)
-    print(f"Server listening on {HOST}:{PORT}")
-
-    # Load existing rooms from DB on startup
+def load_rooms():
     db_rooms = get_all_rooms_db()
-    for room_data in db_rooms:
-        room_name = room_data['name']
-        rooms[room_name] = {'users': {}, 'history': [], 'stats': {'total_messages': 0, 'active_users': 0}}
-        print(f"Loaded room '{room_name}' from database.")
-
+    with lock:
+        for room_data in db_rooms:
+            room_name = room_data['name']
+            rooms[room_name] = {'users': {}, 'is_private': room_data['is_private'], 'history': [], 'stats': {'total_messages': 0, 'active_users': 0}}
+        room_index[:] = sorted(rooms)
+        member_index[:] = [(0, room_name) for room_name in room_index]
+    print(f"Loaded {len(db_rooms)} rooms from database.")
+
+def accept_connections(server_socket):
     while True:
         client_socket, addr = server_socket.accept()
         print(f"Accepted connection from {addr}")
         client_thread = threading.Thread(target=client_handler, args=(client_socket, addr))
         client_thread.start()
 
+def start_server(host=HOST, port=PORT):
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind((host, port))
+    server_socket.listen(5)
+    print(f"Server listening on {host}:{port}")
+
+    if CAPTURE_PATH:
+        open_capture(CAPTURE_PATH)
+
+    # Load existing rooms from DB on startup
+    load_rooms()
+    accept_connections(server_socket)
+
 if __name__ == "__main__":
     start_server()